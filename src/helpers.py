@@ -1,21 +1,34 @@
 import pandas as pd
-import plotly.express as px
 import numpy as np
 from typing import Dict, Tuple
 
-def draw_bar_plot_column_null_values(data_frame: pd.DataFrame, save_path: str = ""):
+def make_null_bar_fig(data_frame: pd.DataFrame):
+    """
+    Build a Plotly bar chart of missing values per column, without showing or saving it.
+    """
     
     if data_frame is None:
         raise ValueError("Data parameter is required")
     
-    if data_frame is None or not isinstance(data_frame, pd.DataFrame):
+    if not isinstance(data_frame, pd.DataFrame):
         raise ValueError("Data parameter must be a pandas DataFrame")
     
+    import plotly.express as px  # imported lazily, only needed for plotting
+    
     rows = data_frame.shape[0]
     summary = data_frame.isnull().sum()
     fig = px.bar(x=summary.index, y=summary.values, labels={'x':'Data Set Column Names', 'y':'Number of Missing Values'}, title='Missing Values per Column')
     fig.add_hline(y=rows, line_dash="dash", line_color="red", annotation_text="Total Rows in Data Set", annotation_position="top left")
-    fig.show()
+    
+    return fig
+
+
+def draw_bar_plot_column_null_values(data_frame: pd.DataFrame, save_path: str = "", show: bool = True):
+    
+    fig = make_null_bar_fig(data_frame)
+    
+    if show:
+        fig.show()
 
     if save_path != "":
         fig.write_image(save_path) #requires kaleido package
@@ -24,7 +37,9 @@ def draw_bar_plot_column_null_values(data_frame: pd.DataFrame, save_path: str =
 
 def convert_categorical_to_numeric(data_frame: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Dict]]:
     """
-    Convert non-numeric and non-boolean columns to numeric values using value counts.
+    Convert non-numeric and non-boolean columns to numeric values using pd.factorize.
+    Codes start at 1 in order of first appearance and use the smallest unsigned integer
+    type that fits; columns with missing values are float so those stay NaN.
     Returns the modified DataFrame and a dictionary mapping original values to numeric codes.
     """
     
@@ -34,35 +49,30 @@ def convert_categorical_to_numeric(data_frame: pd.DataFrame) -> Tuple[pd.DataFra
     if not isinstance(data_frame, pd.DataFrame):
         raise ValueError("Data parameter must be a pandas DataFrame")
     
-    # Create a copy of the dataframe to avoid modifying the original
-    df_numeric = data_frame.copy()
-    
     # Dictionary to store the mapping of original values to numeric codes
     value_mappings = {}
     
-    # Iterate through each column
-    for column in df_numeric.columns:
-        col_data = df_numeric[column]
-        
-        # Check if column is already numeric or boolean
-        if pd.api.types.is_numeric_dtype(col_data) or pd.api.types.is_bool_dtype(col_data):
-            continue
-            
-        # Get value counts for the column (excluding NaN values)
-        value_counts = col_data.value_counts()
-        
-        # Create mapping from unique values to positive integers
-        unique_values = value_counts.index.tolist()
-        value_to_numeric = {value: idx + 1 for idx, value in enumerate(unique_values)}
+    # Shallow copy, so untouched columns are not copied up front and the original is not modified
+    df_numeric = data_frame.copy(deep=False)
+    
+    # Numeric and boolean columns are left as they are
+    categorical_columns = [column for column in data_frame.columns
+                           if not (pd.api.types.is_numeric_dtype(data_frame[column])
+                                   or pd.api.types.is_bool_dtype(data_frame[column]))]
+    
+    for column in categorical_columns:
+        # Factorize assigns integer codes in a single pass, missing values get -1
+        codes, uniques = pd.factorize(data_frame[column], sort=False)
         
         # Store the mapping for reference
-        value_mappings[column] = value_to_numeric
-        
-        # Apply the mapping to convert categorical values to numeric
-        df_numeric[column] = col_data.map(value_to_numeric)
+        value_mappings[column] = dict(zip(uniques, range(1, len(uniques) + 1)))
         
-        # Convert the column to numeric type (handles NaN values properly)
-        df_numeric[column] = pd.to_numeric(df_numeric[column], errors='coerce')
+        # Shift codes to positive integers, using the smallest unsigned type that fits.
+        # Columns with missing values need a float type to keep them as NaN
+        if (codes == -1).any():
+            df_numeric[column] = np.where(codes == -1, np.nan, codes + 1)
+        else:
+            df_numeric[column] = (codes + 1).astype(np.min_scalar_type(len(uniques)))
     
     return df_numeric, value_mappings
 
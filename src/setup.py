@@ -5,26 +5,49 @@ This script checks for required packages and virtual environment setup.
 """
 
 import sys
+import re
+import operator
+import argparse
 import subprocess
+import shutil
 import os
+import functools
 import importlib.util
-from pathlib import Path
-
-# Required packages for the EDA project 
-# TODO - can this be synced with requirements.txt automatically?
-REQUIRED_PACKAGES = {
-    'pandas': 'pandas>=1.3.0',
-    'numpy': 'numpy>=1.21.0',
-    'seaborn': 'seaborn>=0.11.0',
-    'plotly': 'plotly>=5.0.0',
-    'jupyter': 'jupyter>=1.0.0',
-    'matplotlib': 'matplotlib>=3.3.0',
-    'kaleido': 'kaleido>=0.2.1'
-}
+
+# Project root and requirements.txt, the only list of required packages
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUIREMENTS_PATH = os.path.join(_ROOT, 'requirements.txt')
+
+# Whether the interpreter runs inside a virtual environment, detected once at import
+IN_VENV = (
+    hasattr(sys, 'real_prefix') or 
+    (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix) or
+    os.environ.get('VIRTUAL_ENV') is not None
+)
+
+# uv installs the same requirements much faster than pip, used when it is on PATH and a
+# virtual environment is active. Outside one, pip can fall back to a user-site install and uv cannot
+UV = shutil.which('uv') if IN_VENV else None
+
+def _requirement_name(package_spec):
+    """Package name of a requirement line: everything before extras, markers or version specifiers."""
+    return re.split(r'[\s\[;<>=!~]', package_spec, maxsplit=1)[0]
+
+def read_requirements(requirements_path=REQUIREMENTS_PATH):
+    """Read requirements.txt into a {package_name: package_spec} dict."""
+    requirements = {}
+    with open(requirements_path) as f:
+        for line in f:
+            # Drop comments and skip blank lines and pip options such as -r / --index-url
+            line = line.split('#', 1)[0].strip()
+            if not line or line.startswith('-'):
+                continue
+            requirements[_requirement_name(line)] = line
+    return requirements
 
 def check_python_version():
     """Check if Python version is compatible."""
-    min_version = (3, 7) # I am using 3.14 locally, check and modify later. Explore if you can check for Conda instead
+    min_version = (3, 8) # 3.8+ for importlib.metadata. I am using 3.14 locally, check and modify later. Explore if you can check for Conda instead
     current_version = sys.version_info[:2]
     
     if current_version < min_version:
@@ -35,14 +58,8 @@ def check_python_version():
     return True
 
 def check_virtual_environment():
-    """Check if running in a virtual environment."""
-    in_venv = (
-        hasattr(sys, 'real_prefix') or 
-        (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix) or
-        os.environ.get('VIRTUAL_ENV') is not None
-    )
-    
-    if in_venv:
+    """Report whether running in a virtual environment (see IN_VENV)."""
+    if IN_VENV:
         venv_path = os.environ.get('VIRTUAL_ENV', sys.prefix)
         print(f"Virtual environment detected: {venv_path}")
         return True
@@ -50,105 +67,175 @@ def check_virtual_environment():
         print("No virtual environment detected")
         return False
 
+def _canonicalize_name(package_name):
+    """Normalize a package name as in PEP 503, so 'Foo_Bar' and 'foo-bar' match."""
+    return re.sub(r'[-_.]+', '-', package_name).lower()
+
+@functools.lru_cache(maxsize=None)
+def _installed_distributions():
+    """Map canonical names of all installed distributions to their versions, in one sweep of sys.path."""
+    import importlib.metadata  # Python 3.8+, imported here so check_python_version runs first
+    installed = {}
+    for distribution in importlib.metadata.distributions():
+        name = distribution.metadata['Name']
+        if name:
+            # The first match on sys.path wins, as it does for imports
+            installed.setdefault(_canonicalize_name(name), distribution.version)
+    return installed
+
 def check_package_installed(package_name):
-    """Check if a package is installed and importable."""
+    """Check if a package is installed by reading its distribution metadata."""
+    if _canonicalize_name(package_name) in _installed_distributions():
+        return True
+    # Fall back to the import system for packages without distribution metadata
+    # (e.g. namespace packages); find_spec does not execute the package
     try:
-        spec = importlib.util.find_spec(package_name)
-        if spec is not None:
-            # Try to import to ensure it's working
-            __import__(package_name)
-            return True
-    except ImportError:
-        pass
-    return False
+        return importlib.util.find_spec(package_name) is not None
+    except (ImportError, ValueError):
+        return False
 
 def get_package_version(package_name):
-    """Get the version of an installed package."""
-    try:
-        module = __import__(package_name)
-        return getattr(module, '__version__', 'Unknown')
-    except (ImportError, AttributeError):
-        return None
+    """Get the version of an installed package from its distribution metadata."""
+    # 'Unknown' when importable without distribution metadata, see check_package_installed
+    return _installed_distributions().get(_canonicalize_name(package_name), 'Unknown')
 
-def install_package(package_spec):
-    """Install a package using pip."""
-    try:
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', package_spec])
+# Comparison for each version specifier operator, applied to numeric release tuples
+_SPEC_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+def _version_tuple(version):
+    """Numeric release part of a version string, e.g. '2.4.6rc1' -> (2, 4, 6); empty if there is none."""
+    match = re.match(r'\d+(\.\d+)*', version)
+    return tuple(int(part) for part in match.group(0).split('.')) if match else ()
+
+def version_satisfies(version, package_spec):
+    """Check an installed version against the version bounds of a requirement line."""
+    installed = _version_tuple(version)
+    if not installed:
+        # No usable version (e.g. 'Unknown'), nothing to compare against
         return True
-    except subprocess.CalledProcessError:
+    # Drop the name, any extras and environment markers, leaving e.g. '>=1.3.0,<4'
+    specifiers = package_spec[len(_requirement_name(package_spec)):].split(';', 1)[0]
+    specifiers = re.sub(r'^\s*\[[^\]]*\]', '', specifiers)
+    for clause in specifiers.split(','):
+        match = re.match(r'\s*(~=|==|!=|<=|>=|<|>)\s*(\S+)', clause)
+        if not match:
+            continue
+        op, bound = match.group(1), _version_tuple(match.group(2))
+        # Pad with zeros so 3 and 3.0.0 compare equal
+        width = max(len(installed), len(bound))
+        current = installed + (0,) * (width - len(installed))
+        padded_bound = bound + (0,) * (width - len(bound))
+        if op == '~=':
+            # ~=X.Y means >=X.Y and ==X.*
+            if current < padded_bound or current[:len(bound) - 1] != bound[:-1]:
+                return False
+        elif not _SPEC_OPERATORS[op](current, padded_bound):
+            return False
+    return True
+
+def is_requirement_satisfied(package_name, package_spec):
+    """Check that a package is installed and its version is within the bounds of its requirement line."""
+    return (check_package_installed(package_name)
+            and version_satisfies(get_package_version(package_name), package_spec))
+
+def install_packages(package_specs):
+    """Install packages in a single installer run so the resolver runs once, using uv when UV is set."""
+    if UV:
+        # uv does not upgrade satisfied packages and has no self-version check
+        cmd = [UV, 'pip', 'install', '--python', sys.executable, *package_specs]
+    else:
+        cmd = [
+            sys.executable, '-m', 'pip', 'install',
+            '--disable-pip-version-check',  # skip the PyPI self-version check
+            '--prefer-binary',  # pick an older wheel over building a newer sdist
+            '--upgrade-strategy=only-if-needed',
+            *package_specs,
+        ]
+    installer = 'uv' if UV else 'pip'
+    
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, text=True)
+    except OSError as e:
+        print(f"Could not run {installer}: {e}")
         return False
+    
+    # Stream the installer's output line by line, indented so it stays apart from this script's messages
+    for line in process.stdout:
+        print(f"    {line.rstrip()}")
+    return process.wait() == 0
 
-def check_and_install_packages():
-    """Check for required packages and offer to install missing ones."""
+def print_install_hints():
+    """Print the command to install the requirements by hand, with the same installer this script uses."""
+    # Absolute and quoted, so it works from any directory and with spaces in the path
+    installer = 'uv pip' if UV else 'pip'
+    print(f'  {installer} install -r "{REQUIREMENTS_PATH}"')
+
+def check_and_install_packages(assume_yes=False):
+    """Check for required packages and offer to install missing ones (without asking if assume_yes)."""
     missing_packages = []
     installed_packages = []
     
     print("\n Checking required packages...")
     print("-" * 50)
     
-    for package_name, package_spec in REQUIRED_PACKAGES.items():
-        if check_package_installed(package_name):
-            version = get_package_version(package_name)
+    for package_name, package_spec in read_requirements().items():
+        if not check_package_installed(package_name):
+            print(f"{package_name} - Not installed")
+            missing_packages.append((package_name, package_spec))
+            continue
+        
+        version = get_package_version(package_name)
+        if version_satisfies(version, package_spec):
             print(f"{package_name} {version}")
             installed_packages.append(package_name)
         else:
-            print(f"{package_name} - Not installed")
+            # Installed, but outside the tested range, so it gets reinstalled like a missing package
+            print(f"{package_name} {version} - Outside required range: {package_spec}")
             missing_packages.append((package_name, package_spec))
     
     if missing_packages:
-        print(f"\nMissing {len(missing_packages)} required package(s)")
-        print("\nMissing packages:")
+        print(f"\nMissing or out of range: {len(missing_packages)} required package(s)")
+        print("\nPackages to install:")
         for pkg_name, pkg_spec in missing_packages:
             print(f"  - {pkg_name}")
         
-        response = input("\nWould you like to install missing packages? (y/n): ").lower().strip()
+        response = 'y' if assume_yes else input("\nWould you like to install missing packages? (y/n): ").lower().strip()
         
         if response in ['y', 'yes']:
             print("\n🔧 Installing missing packages...")
-            failed_installs = []
+            # Let the installer resolve the whole file in one go, satisfied packages are left alone
+            if not install_packages(['-r', REQUIREMENTS_PATH]):
+                print("The installer reported an error, checking which packages were installed...")
             
-            for pkg_name, pkg_spec in missing_packages:
-                print(f"Installing {pkg_name}...")
-                if install_package(pkg_spec):
-                    print(f"Successfully installed {pkg_name}")
-                else:
-                    print(f"Failed to install {pkg_name}")
-                    failed_installs.append(pkg_name)
+            # Forget cached lookups so the re-check reads what the installer just installed,
+            # a partial failure then only reports the packages still missing
+            _installed_distributions.cache_clear()
+            failed_installs = [pkg_name for pkg_name, pkg_spec in missing_packages
+                               if not is_requirement_satisfied(pkg_name, pkg_spec)]
             
             if failed_installs:
                 print(f"\nFailed to install: {', '.join(failed_installs)}")
                 print("Please install them manually using:")
-                for pkg_name in failed_installs:
-                    pkg_spec = next(spec for name, spec in missing_packages if name == pkg_name)
-                    print(f"  pip install {pkg_spec}")
+                print_install_hints()
                 return False
             else:
                 print("\nAll packages installed successfully!")
                 return True
         else:
             print("\nSetup cancelled. Please install required packages manually:")
-            for pkg_name, pkg_spec in missing_packages:
-                print(f"  pip install {pkg_spec}")
+            print_install_hints()
             return False
     else:
         print("\nAll required packages are installed!")
         return True
 
-def create_requirements_file():
-    """Create a requirements.txt file for easy installation."""
-    requirements_path = Path(__file__).parent.parent / "requirements.txt"
-    
-    if not requirements_path.exists():
-        print(f"\nCreating requirements.txt file...")
-        with open(requirements_path, 'w') as f:
-            f.write("# UCB Driver Coupon Analysis EDA Requirements\n")
-            f.write("# Install with: pip install -r requirements.txt\n\n")
-            for package_spec in REQUIRED_PACKAGES.values():
-                f.write(f"{package_spec}\n")
-        print(f"Created {requirements_path}")
-    else:
-        print(f"Requirements file already exists: {requirements_path}")
-
 def print_setup_instructions():
     """Print setup instructions for users."""
     print("\n" + "="*60)
@@ -169,8 +256,20 @@ def print_setup_instructions():
     print("\n5. Open the analysis notebook:")
     print("   prompt.ipynb")
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Check and set up the environment for the UCB Driver Coupon Analysis EDA.")
+    parser.add_argument('-y', '--yes', '--non-interactive', dest='yes', action='store_true',
+                        help="answer yes to the virtual environment and install prompts, for scripted or CI use "
+                             "(implies --no-jupyter, since Jupyter would block)")
+    parser.add_argument('--no-jupyter', action='store_true',
+                        help="do not offer to start Jupyter Notebook at the end")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main setup function."""
+    args = parse_args(argv)
+    
     print("UCB Driver Coupon Analysis - Environment Setup")
     print("="*50)
     
@@ -185,16 +284,19 @@ def main():
         print("\nRECOMMENDATION: Use a virtual environment")
         print("This helps avoid package conflicts with your system Python.")
         
-        response = input("\nContinue without virtual environment? (y/n): ").lower().strip()
+        response = 'y' if args.yes else input("\nContinue without virtual environment? (y/n): ").lower().strip()
         if response not in ['y', 'yes']:
             print_setup_instructions()
             sys.exit(0)
     
-    # Create requirements file
-    create_requirements_file()
+    # requirements.txt lists the packages to check and install
+    if not os.path.exists(REQUIREMENTS_PATH):
+        print(f"\nRequirements file not found: {REQUIREMENTS_PATH}")
+        print("It ships with the repository, restore it (e.g. git checkout -- requirements.txt) and run this script again.")
+        sys.exit(1)
     
     # Check and install packages
-    packages_ready = check_and_install_packages()
+    packages_ready = check_and_install_packages(assume_yes=args.yes)
     
     if packages_ready:
         print("\nSETUP COMPLETE!")
@@ -206,8 +308,9 @@ def main():
         print("2. Navigate to and open: prompt.ipynb")
         print("3. Run the cells to start your EDA!")
         
-        # Check if Jupyter is available
-        if check_package_installed('jupyter'):
+        # jupyter is in the requirements, so packages_ready means it is installed.
+        # The server blocks until stopped, so only start it when asked interactively
+        if not (args.no_jupyter or args.yes):
             response = input("\nWould you like to start Jupyter Notebook now? (y/n): ").lower().strip()
             if response in ['y', 'yes']:
                 try: